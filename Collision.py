@@ -0,0 +1,156 @@
+from VMFNode import getBounds
+import numpy as np
+
+LEAF_SIZE = 8 # The maximum number of boxes in a leaf of a BVH. All pairs of two leaves are checked at once.
+
+def getSolidBoxes(root, bounds):
+  """Returns the bounding boxes of all solids below the given node as an array of shape (n, 2, 3).
+     The boxes are extruded to the full height of the given tile bounds: rooms are empty space between their walls,
+     but floors and ceilings cover the rooms' footprint, so the extruded boxes cover everything a tile occupies,
+     but not the empty parts of a tile which is not rectangular."""
+  solids = root.FindRecurse(lambda node : node.name == "solid")
+  boxes = []
+  for solid in solids:
+    planes = [side.plane for side in solid.children if side.name == "side" and not np.all(side.plane) == None]
+    if len(planes) > 0:
+      boxes.append(getBounds(np.concatenate(planes)))
+  if len(boxes) == 0:
+    return np.array([bounds])
+  boxes = np.array(boxes)
+  boxes[:,0,2] = bounds[0][2]
+  boxes[:,1,2] = bounds[1][2]
+  return boxes
+
+def coversFootprint(boxes, bounds):
+  """Checks whether the extruded boxes cover the whole footprint of the tile bounds.
+     The footprint is split into cells at all box edges, a cell is covered if its center is within any box."""
+  edges = []
+  for axis in range(2):
+    coordinates = np.concatenate([boxes[:,0,axis], boxes[:,1,axis], bounds[:,axis]])
+    coordinates = np.unique(np.clip(coordinates, bounds[0][axis], bounds[1][axis]))
+    edges.append((coordinates[:-1] + coordinates[1:]) / 2)
+  centers = np.stack(np.meshgrid(edges[0], edges[1]), axis=-1).reshape(-1, 2)
+  covered = np.zeros(len(centers), dtype=bool)
+  for box in boxes:
+    covered |= np.all((centers > box[0,:2]) & (centers < box[1,:2]), axis=1)
+  return bool(np.all(covered))
+
+def overlap(lower, upper, otherLower, otherUpper):
+  """Checks whether two boxes given by their corners overlap (touching boxes do not overlap)"""
+  return bool(np.all(lower < otherUpper) and np.all(otherLower < upper))
+
+class BVH:
+  """The BVH (bounding volume hierarchy) holds a binary tree of boxes
+     The nodes are stored in flat arrays. Leaves refer to a range of the boxes, which are sorted accordingly.
+     https://en.wikipedia.org/wiki/Bounding_volume_hierarchy"""
+
+  def __init__(self, boxes):
+    """Builds the tree by splitting the boxes at the median of the longest axis"""
+    self.lower = []
+    self.upper = []
+    self.children = []
+    self.ranges = []
+    order = np.arange(len(boxes))
+    self.build(boxes, order, 0, len(boxes))
+    boxes = boxes[order]
+    self.boxLower = boxes[:,0]
+    self.boxUpper = boxes[:,1]
+    self.lower = np.array(self.lower)
+    self.upper = np.array(self.upper)
+
+  def build(self, boxes, order, start, end):
+    """Recursively adds the node for the boxes order[start:end], returns its index"""
+    index = len(self.lower)
+    nodeBoxes = boxes[order[start:end]]
+    self.lower.append(np.min(nodeBoxes[:,0], axis=0))
+    self.upper.append(np.max(nodeBoxes[:,1], axis=0))
+    self.children.append(None)
+    self.ranges.append((start, end))
+    if end - start > LEAF_SIZE:
+      centers = nodeBoxes[:,0] + nodeBoxes[:,1]
+      axis = np.argmax(self.upper[index] - self.lower[index])
+      order[start:end] = order[start:end][np.argsort(centers[:,axis], kind="stable")]
+      middle = (start + end) // 2
+      left = self.build(boxes, order, start, middle)
+      right = self.build(boxes, order, middle, end)
+      self.children[index] = (left, right)
+    return index
+
+  def isLeaf(self, node):
+    return self.children[node] == None
+
+  def getVolume(self, node):
+    return np.prod(self.upper[node] - self.lower[node])
+
+  def intersects(self, other, offset):
+    """Checks whether any box of this BVH overlaps any box of the other BVH translated by the given offset"""
+    stack = [(0, 0)]
+    while len(stack) > 0:
+      node, otherNode = stack.pop()
+      if not overlap(self.lower[node], self.upper[node], other.lower[otherNode] + offset, other.upper[otherNode] + offset):
+        continue
+      if self.isLeaf(node) and other.isLeaf(otherNode):
+        start, end = self.ranges[node]
+        otherStart, otherEnd = other.ranges[otherNode]
+        otherLower = other.boxLower[otherStart:otherEnd] + offset
+        otherUpper = other.boxUpper[otherStart:otherEnd] + offset
+        sizes = np.minimum(self.boxUpper[start:end,None], otherUpper[None]) - np.maximum(self.boxLower[start:end,None], otherLower[None])
+        if np.any(np.all(sizes > 0, axis=2)):
+          return True
+      elif other.isLeaf(otherNode) or (not self.isLeaf(node) and self.getVolume(node) > other.getVolume(otherNode)):
+        for child in self.children[node]:
+          stack.append((child, otherNode))
+      else:
+        for otherChild in other.children[otherNode]:
+          stack.append((node, otherChild))
+    return False
+
+class CollisionWorld:
+  """The CollisionWorld holds the tiles placed in a map for collision detection
+     A broadphase checks the tiles' bounding boxes all at once, a narrowphase checks the per-solid boxes of the tiles in question.
+     A tile without a BVH collides with its whole bounding box."""
+
+  def __init__(self, region=None):
+    """Constructor for an empty world. If a region is given, tiles must be placed within these bounds."""
+    self.region = region
+    self.lower = np.zeros((16, 3))
+    self.upper = np.zeros((16, 3))
+    self.bounds = []
+    self.bvhs = []
+    self.vectors = []
+
+  def __len__(self):
+    return len(self.bounds)
+
+  def add(self, bounds, bvh=None, vector=None):
+    """Adds a tile with the given bounding box, BVH and translation vector of the BVH"""
+    count = len(self.bounds)
+    if count == len(self.lower):
+      self.lower = np.concatenate([self.lower, np.zeros_like(self.lower)])
+      self.upper = np.concatenate([self.upper, np.zeros_like(self.upper)])
+    self.lower[count] = bounds[0]
+    self.upper[count] = bounds[1]
+    self.bounds.append(bounds)
+    self.bvhs.append(bvh)
+    self.vectors.append(vector)
+
+  def collides(self, bounds, bvh=None, vector=None):
+    """Checks whether a tile with the given bounding box, BVH and translation vector of the BVH collides with any tile of this world"""
+    if not self.region is None:
+      if np.any(bounds[0] < self.region[0]) or np.any(bounds[1] > self.region[1]):
+        return True
+    count = len(self.bounds)
+    sizes = np.minimum(self.upper[:count], bounds[1]) - np.maximum(self.lower[:count], bounds[0])
+    candidates = np.nonzero(np.all(sizes > 0, axis=1))[0]
+    for candidate in candidates:
+      otherBvh = self.bvhs[candidate]
+      if bvh == None or otherBvh == None:
+        return True
+      if otherBvh.intersects(bvh, vector - self.vectors[candidate]):
+        return True
+    return False
+
+  def getBounds(self):
+    """Returns the bounding box around all tiles of this world"""
+    count = len(self.bounds)
+    return np.array([np.min(self.lower[:count], axis=0), np.max(self.upper[:count], axis=0)])
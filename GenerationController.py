@@ -0,0 +1,76 @@
+import time
+
+COMPLETE = "complete" # All tiles were added
+DEADLINE = "deadline" # The time budget was used up
+STALLED = "stalled" # Too many attempts in a row failed
+EXHAUSTED = "exhausted" # The maximum number of attempts was reached
+ROLLED_BACK = "rolled_back" # Adding tiles stopped for another reason, then the last tiles were removed again to append the finale tile
+
+class GenerationController:
+  """The GenerationController decides when to stop adding tiles to a map
+     Adding tiles stops when all tiles were added, when the deadline has passed,
+     when too many attempts in a row failed or when the maximum number of attempts was reached.
+     If the last tiles have to be removed again to append the finale tile, the status becomes ROLLED_BACK and the original one is kept in stopStatus."""
+
+  def __init__(self, numberOfTiles, maxAttempts, deadline=None, stallLimit=None):
+    """Constructor. The deadline is given in seconds from now, stallLimit is the number of failed attempts in a row."""
+    self.numberOfTiles = numberOfTiles
+    self.maxAttempts = maxAttempts
+    if deadline == None:
+      self.deadline = None
+    else:
+      self.deadline = time.time() + deadline
+    self.stallLimit = stallLimit
+    self.tilesAdded = 0
+    self.attempts = 0
+    self.failures = 0
+    self.status = None
+    self.stopStatus = None
+    self.tilesPlaced = 0
+
+  def record(self, success):
+    """Records the result of an attempt to add a tile"""
+    self.attempts += 1
+    if success:
+      self.tilesAdded += 1
+      self.failures = 0
+    else:
+      self.failures += 1
+
+  def shouldStop(self):
+    """Checks whether adding tiles should stop and sets the status accordingly"""
+    if self.tilesAdded >= self.numberOfTiles:
+      self.status = COMPLETE
+    elif self.attempts >= self.maxAttempts:
+      self.status = EXHAUSTED
+    elif not self.stallLimit == None and self.failures >= self.stallLimit:
+      self.status = STALLED
+    elif not self.deadline == None and time.time() >= self.deadline:
+      self.status = DEADLINE
+    return not self.status == None
+
+  def rollBack(self, tilesAdded):
+    """Records that the map was rolled back to the given number of tiles to append the finale tile"""
+    self.stopStatus = self.status
+    self.status = ROLLED_BACK
+    self.tilesPlaced = self.tilesAdded
+    self.tilesAdded = tilesAdded
+
+  def explain(self):
+    """Returns a human readable explanation of the status"""
+    status = self.status
+    if status == ROLLED_BACK:
+      status = self.stopStatus
+    if status == COMPLETE:
+      explanation = "All " + str(self.numberOfTiles) + " tiles were added."
+    elif status == EXHAUSTED:
+      explanation = "The maximum of " + str(self.maxAttempts) + " attempts was reached."
+    elif status == STALLED:
+      explanation = str(self.stallLimit) + " attempts in a row failed."
+    elif status == DEADLINE:
+      explanation = "The deadline has passed."
+    else:
+      explanation = "Still adding tiles."
+    if self.status == ROLLED_BACK:
+      explanation += " Rolled back from " + str(self.tilesPlaced) + " to " + str(self.tilesAdded) + " tiles to append the finale tile."
+    return explanation
@@ -1,5 +1,6 @@
+from Collision import BVH, coversFootprint, getSolidBoxes
 from VMFFile import VMFFile
-from VMFNode import getBounds
+from VMFNode import getBounds, emptyCounts, addCounts
 import copy
 import numpy as np
 
@@ -79,24 +80,171 @@ def translateBounds(bounds, vector):
   bounds[1] += vector
   return bounds
     
-def intersect(bounds, otherBounds):
-  """Intersects two bounding boxes"""
-  upperBounds = np.append(bounds[1],otherBounds[1]).reshape((2,3))
-  upperBound = np.min(upperBounds, axis=0)
-  lowerBounds = np.append(bounds[0],otherBounds[0]).reshape((2,3))
-  lowerBound = np.max(lowerBounds, axis=0)
-  return np.array([lowerBound,upperBound])
+class TileLayout:
+  """The TileLayout yields the bounds and portals of a map without its VMF tree.
+     This is all that is needed to decide where tiles go, so placements can be tried without copying and merging VMF trees."""
+
+  def __init__(self):
+    """Empty constructor"""
+    pass
+
+  def layout(self):
+    """Returns a copy of this map's layout without the VMF tree"""
+    layout = TileLayout()
+    self.copyLayoutTo(layout)
+    return layout
+
+  def copyLayoutTo(self, other):
+    """Copies the layout data of this map to the other one"""
+    other.bounds = self.bounds
+    other.bvh = self.bvh
+    other.doors = copy.deepcopy(self.doors)
+    other.portals = dict(self.portals)
+    other.maxId = self.maxId
+    other.filename = self.filename
+    other.once = self.once
+    other.owners = dict(self.owners)
+    other.links = list(self.links)
+    other.tileCount = self.tileCount
+    other.placements = list(self.placements)
+    other.counts = dict(self.counts)
+    other.portalCounts = dict(self.portalCounts)
+    other.startCounts = self.startCounts
+
+  def setOnce(self, o):
+    self.once = o
+
+  def getOnce(self):
+    return self.once
+
+  def translate(self, vector):
+    """Translate this layout by the given vector"""
+    self.bounds = translateBounds(self.bounds,vector)
+    for id in list(self.portals.keys()):
+      self.portals[id] = self.portals[id] + vector
+
+  def increaseIds(self, increase):
+    """Increase the portal solid IDs of this layout"""
+    for direction in list(self.doors.keys()):
+      for portalSolidId in self.doors[direction]:
+        portalSolidId[0] = str(int(portalSolidId[0]) + increase)
+    self.portals = dict((str(int(id) + increase), portal) for id, portal in self.portals.items())
+    self.owners = dict((str(int(id) + increase), tile) for id, tile in self.owners.items())
+    self.portalCounts = dict((str(int(id) + increase), counts) for id, counts in self.portalCounts.items())
+    self.maxId += increase
+
+  def removePortal(self, direction, id):
+    """Remove the portal on the solid with the given ID, it is not available for connections anymore"""
+    self.doors[direction] = [door for door in self.doors[direction] if not door[0] == id]
+    self.portals.pop(id, None)
+    self.portalCounts.pop(id, None)
+
+  def findConnections(self, otherMap, tailLength=None):
+    """Returns a list of possible connections between this and the other map.
+    If tailLength is set, this map acts as if it only had tailLength portals with the highest IDs."""
+    connections = []
+    doors = self.doors
+
+    if tailLength:
+      directionByDoor = dict()
+      directionByDoorLength = dict()
+      for direction, doorList in list(self.doors.items()):
+        for door in doorList:
+          directionByDoor[int(door[0])] = direction
+          directionByDoorLength[int(door[0])] = door[1]
+      tailDoors = sorted(iter(list(directionByDoor.keys())),reverse=True)[:tailLength]
+      doors = dict({'north': [], 'east': [], 'south': [], 'west': [], 'up': [], 'down': []})
+      for door in tailDoors:
+        doors[directionByDoor[door]].append([str(door), directionByDoorLength[door]])
     
-def collide(bounds, otherBounds):
-  """Checks whether two bounding boxes collide"""
-  intersection = intersect(bounds, otherBounds)
-  size = intersection[1]-intersection[0]
-  collide = np.all(size > np.array([0,0,0]))
-  # if collide:
-    # print "Tiles collide",intersection
-  return collide
+    doorListsByDirection = list(doors.items())
+
+    for direction, doorList in doorListsByDirection:
+      if len(doorList) > 0:
+        otherDoorList = otherMap.doors[oppositeDirection(direction)]
+        
+        # oh brother
+        # love to see that n^2 runtime
+        if len(otherDoorList) > 0:
+          for i in range(len(doorList)):
+            for j in range(len(otherDoorList)):
+              if doorList[i][1] == otherDoorList[j][1]:
+                print("Adding Connection", (direction, doorList[i][0], otherDoorList[j][0]))
+                connections.append((direction, doorList[i][0], otherDoorList[j][0]))
+          
+    print("Total:", len(connections), "connections")
+    return connections
     
-class MapTile:
+  def findPortalsAndVector(self, otherMap, connection):
+    """Returns all information needed to connect the otherMap to this one using the given connection"""
+    mapPortal = self.portals[connection[1]]
+    otherMapPortal = otherMap.portals[connection[2]]
+    vector = getTranslationVector(mapPortal, otherMapPortal)
+    return (vector, mapPortal, otherMapPortal)
+
+  def append(self, otherMap, connection, vectors):
+    """Appends the otherMap layout to this one using the given connection and vectors.
+       The appended map is recorded in placements, so the same placements can be applied to another map."""
+    self.placements.append((otherMap, connection, vectors))
+    otherMap = otherMap.layout()
+    return self.mend(otherMap, connection, vectors)
+
+  def mend(self, otherMap, connection, vectors):
+    """Mends the layout of the otherMap with this one using the given connection and translation vector.
+       The tiles of the otherMap are numbered after the ones of this map, the connection is recorded in links."""
+    vector = vectors[0]
+    (direction, selfDoor, newDoor) = connection
+    selfTile = self.owners[selfDoor]
+    newTile = otherMap.owners[newDoor]
+
+    self.removeCounts(otherMap, connection)
+    otherMap.removePortal(oppositeDirection(direction), newDoor)
+    self.removePortal(direction, selfDoor)
+
+    if otherMap == self:
+      self.links.append((selfTile, newTile))
+    else:
+      # IDs are shifted by the highest ID ever seen instead of searching the tree for the current one.
+      # Deleted nodes only lower the current maximum, so the IDs stay unique.
+      otherMap.increaseIds(self.maxId)
+      otherMap.translate(vector)
+      self.links.append((selfTile, self.tileCount + newTile))
+      self.addOtherMap(otherMap)
+
+  def removeCounts(self, otherMap, connection):
+    """Subtracts what mend removes from the maps (portal solids, doors near the other map's portal and its info_player_start) from their counts"""
+    (direction, selfDoor, newDoor) = connection
+    addCounts(self.counts, self.portalCounts[selfDoor][0], -1)
+    if otherMap == self:
+      addCounts(self.counts, self.portalCounts[newDoor][0], -1)
+    else:
+      addCounts(otherMap.counts, otherMap.portalCounts[newDoor][0], -1)
+      addCounts(otherMap.counts, otherMap.portalCounts[newDoor][1], -1)
+      addCounts(otherMap.counts, otherMap.startCounts, -1)
+
+  def exceedsLimits(self, otherMap, limits):
+    """Checks whether appending the otherMap could exceed any of the given limits of the counts"""
+    for key, limit in list(limits.items()):
+      if self.counts[key] + otherMap.counts[key] > limit:
+        return True
+    return False
+
+  def addOtherMap(self, otherMap):
+    """Adds the portals and tiles of the otherMap layout to this one"""
+    for direction in list(otherMap.doors.keys()):
+      for portalSolidId in otherMap.doors[direction]:
+        self.doors[direction].append(portalSolidId)
+    self.portals.update(otherMap.portals)
+    self.portalCounts.update(otherMap.portalCounts)
+    addCounts(self.counts, otherMap.counts)
+    for id, tile in otherMap.owners.items():
+      self.owners[id] = self.tileCount + tile
+    for tile, otherTile in otherMap.links:
+      self.links.append((self.tileCount + tile, self.tileCount + otherTile))
+    self.tileCount += otherMap.tileCount
+    self.maxId = max(self.maxId, otherMap.maxId)
+
+class MapTile(TileLayout):
   """The MapTile yields data for a complete map"""
   
   def __init__(self):
@@ -109,30 +257,52 @@ class MapTile:
     self.map = VMFFile()
     self.map.fromfile(filename)
     self.bounds = self.map.root.GetBoundsRecurse()
+    boxes = getSolidBoxes(self.map.root, self.bounds)
+    if coversFootprint(boxes, self.bounds):
+      self.bvh = None # the tile collides with its whole bounding box, a BVH would not rule out any collision
+    else:
+      self.bvh = BVH(boxes)
     self.filename = filename
     self.analyzePortals()
     self.once = False
+    self.maxId = self.map.root.GetMaximumIdRecurse(0)
+    self.links = []
+    self.tileCount = 1
+    self.placements = []
+    self.counts = self.map.root.CountRecurse(emptyCounts())
+    self.startCounts = emptyCounts()
+    for start in self.map.root.FindRecurse(lambda node : "classname" in node.properties and node.properties["classname"] == "info_player_start"):
+      start.CountRecurse(self.startCounts)
     
   def deepcopy(self):
     """Returns a deep copy of this map"""
     deepcopy = MapTile()
     deepcopy.map = self.map.deepcopy()
-    deepcopy.bounds = self.bounds
-    deepcopy.doors = copy.deepcopy(self.doors)
-    deepcopy.filename = self.filename
-    deepcopy.once = self.once
+    self.copyLayoutTo(deepcopy)
     return deepcopy
-  
-  def setOnce(self, o):
-    self.once = o
-
-  def getOnce(self):
-    return self.once
     
   def translate(self, vector):
     """Translate this map by the given vector"""
+    print("Translating new map with vector", vector, "...")
     self.map.root.TranslateRecurse(vector)
-    self.bounds = translateBounds(self.bounds,vector)
+    TileLayout.translate(self, vector)
+
+  def increaseIds(self, increase):
+    """Increase all IDs of this map"""
+    self.map.root.IncreaseIdRecurse(increase)
+    TileLayout.increaseIds(self, increase)
+    print("Increased IDs in new map by", increase)
+
+  def addOtherMap(self, otherMap):
+    """Adds the VMF tree of the otherMap to this one"""
+    print("Adding new map...")
+    self.map.root.AddOtherMap(otherMap.map.root)
+    TileLayout.addOtherMap(self, otherMap)
+    print("New map merged!")
+
+  def removeCounts(self, otherMap, connection):
+    """Nothing to do, the counts of a map are updated when nodes are deleted from its VMF tree"""
+    pass
   
   def getPortalDirection(self, portalPlane):
     """Find out on which side of the map tile a portal is located"""
@@ -166,99 +336,43 @@ class MapTile:
   def analyzePortals(self):
     """Find all IDs of solids with a portal and the portals' directions"""
     doors = dict({'north': [], 'east': [], 'south': [], 'west': [], 'up': [], 'down': []})
+    portals = dict()
+    portalCounts = dict()
     solids = self.map.root.FindRecurse(lambda node : node.name == "solid" and not np.all(findPortalOnSolid(node)) == None)
     for solid in solids:
       portal = findPortalOnSolid(solid)
       direction = self.getPortalDirection(portal)
       doors[direction].append([solid.properties["id"], getLength(portal, direction)])
+      portals[solid.properties["id"]] = portal.copy() # the tree's plane is translated in place
+      doorCounts = emptyCounts()
+      for door in self.map.root.FindRecurse(lambda node : "classname" in node.properties and node.properties["classname"] == "prop_door_rotating" and pointNearPlane(node.origin,portal)):
+        door.CountRecurse(doorCounts)
+      portalCounts[solid.properties["id"]] = (solid.CountRecurse(emptyCounts()), doorCounts)
     
     self.doors = doors
-    
-  def findConnections(self, otherMap, tailLength=None):
-    """Returns a list of possible connections between this and the other map.
-    If tailLength is set, this map acts as if it only had tailLength portals with the highest IDs."""
-    connections = []
-    doorListsByDirection = list(self.doors.items())
-
-    if tailLength:
-      directionByDoor = dict()
-      directionByDoorLength = dict()
-      for direction, doorList in doorListsByDirection:
-        for door in doorList:
-          directionByDoor[int(door[0])] = direction
-          directionByDoorLength[int(door[0])] = door[1]
-      tailDoors = sorted(iter(list(directionByDoor.keys())),reverse=True)[:tailLength]
-      doors = dict({'north': [], 'east': [], 'south': [], 'west': [], 'up': [], 'down': []})
-      for door in tailDoors:
-        doors[directionByDoor[door]].append([str(door), directionByDoorLength[door]])
-    
-    doorListsByDirection = list(doors.items())
-
-    for direction, doorList in doorListsByDirection:
-      if len(doorList) > 0:
-        otherDoorList = otherMap.doors[oppositeDirection(direction)]
-        
-        # oh brother
-        # love to see that n^2 runtime
-        if len(otherDoorList) > 0:
-          for i in range(len(doorList)):
-            for j in range(len(otherDoorList)):
-              if doorList[i][1] == otherDoorList[j][1]:
-                print("Adding Connection", (direction, doorList[i][0], otherDoorList[j][0]))
-                connections.append((direction, doorList[i][0], otherDoorList[j][0]))
-          
-    print("Total:", len(connections), "connections")
-    return connections
-    
-  def findPortalsAndVector(self, otherMap, connection):
-    """Returns all information needed to connect the otherMap to this one using the given connection"""
-    mapPortal = self.findPortalOnSolidWithId(connection[1])
-    otherMapPortal = otherMap.findPortalOnSolidWithId(connection[2])
-    vector = getTranslationVector(mapPortal, otherMapPortal)
-    return (vector, mapPortal, otherMapPortal)
+    self.portals = portals
+    self.portalCounts = portalCounts
+    self.owners = dict((id, 0) for id in portals.keys())
     
   def append(self, otherMap, connection, vectors):
     """Appends the otherMap data to this one using the given connection and vectors.
        Mends the maps together by removing portal solids or doors where applicable."""
+    self.placements.append((otherMap, connection, vectors))
     otherMap = otherMap.deepcopy()
     return self.mend(otherMap, connection, vectors)
     
-  def findPortalOnSolidWithId(self, id):
-    """Finds a portal on the solid with the given ID."""
-    object = self.map.root.FindRecurse(lambda node : node.name == "solid" and node.properties["id"] == id)
-    solid = object[0]
-    portal = findPortalOnSolid(solid)
-    if np.all(portal) == None:
-      print(("ERROR: Every portal must have a solid having a side with the material "+ OUTSIDE_MATERIAL +" marking the outside"))
-    return portal
-    
   def mend(self, otherMap, connection, vectors):
     """Mends the otherMap with this one using the given connection, portals and translation vector."""
     vector, mapPortal, otherMapPortal = vectors
     (direction, selfDoor, newDoor) = connection
     
     if not otherMap == self:
-      removed = otherMap.map.root.DeleteRecurse(lambda node : "classname" in node.properties and node.properties["classname"] == "info_player_start")
+      removed = otherMap.map.root.DeleteRecurse(lambda node : "classname" in node.properties and node.properties["classname"] == "info_player_start", otherMap.counts)
       print("Removed", removed, "info_player_start from other map")
-      removed = otherMap.map.root.DeleteRecurse(lambda node : "classname" in node.properties and node.properties["classname"] == "prop_door_rotating" and pointNearPlane(node.origin,otherMapPortal))
+      removed = otherMap.map.root.DeleteRecurse(lambda node : "classname" in node.properties and node.properties["classname"] == "prop_door_rotating" and pointNearPlane(node.origin,otherMapPortal), otherMap.counts)
       print("Removed", removed, "doors from other map")
-    removed = otherMap.map.root.DeleteRecurse(lambda node : node.name == "solid" and node.properties["id"] == newDoor)
+    removed = otherMap.map.root.DeleteRecurse(lambda node : node.name == "solid" and node.properties["id"] == newDoor, otherMap.counts)
     print("Removed", removed, "solids from other map")
-
-    # we gotta hunt for the fabled portalIndex
-    otherDoors = otherMap.doors[oppositeDirection(direction)]
-    door = -1
-
-    # not the best solution, but I'm not going for optimization rn
-    for door in otherDoors:
-      for item in door:
-        if item == newDoor:
-          break
-      if item == newDoor:
-        break
-    
-    # will error if it doesn't find the door, of course
-    otherDoors.remove(door)
       
     entities = self.map.root.FindRecurse(lambda node : node.name == "entity" and not node.properties["classname"] == "func_detail" and pointNearPlane(node.origin,mapPortal))
     removed = 0
@@ -266,38 +380,10 @@ class MapTile:
       removed += entity.DeleteRecurse(lambda node : node.name == "editor")
     print("Removed", removed, "editor information from remaining entities in base map")
 
-    removed = self.map.root.DeleteRecurse(lambda node : node.name == "solid" and node.properties["id"] == selfDoor)
+    removed = self.map.root.DeleteRecurse(lambda node : node.name == "solid" and node.properties["id"] == selfDoor, self.counts)
     print("Removed", removed, "solids from base map")
 
-    # we'll have to do the same thing again here
-    selfDoors = self.doors[direction]
-    door = -1
-
-    for door in selfDoors:
-      for item in door:
-        if item == selfDoor:
-          break
-      if item == selfDoor:
-        break
-
-    selfDoors.remove(door)
-
-    if not otherMap == self:
-      maxId = self.map.root.GetMaximumIdRecurse(0)
-      otherMap.map.root.IncreaseIdRecurse(maxId)
-      print("Increased IDs in new map by", maxId)
-
-      print("Translating new map with vector", vector, "...")
-      otherMap.translate(vector)
-
-      print("Adding new map...")
-      self.map.root.AddOtherMap(otherMap.map.root)
-      
-      for direction in list(otherMap.doors.keys()):
-        for portalSolidId in otherMap.doors[direction]:
-          portalSolidId[0] = str(int(portalSolidId[0]) + maxId)
-          self.doors[direction].append(portalSolidId)
-      print("New map merged!")
+    TileLayout.mend(self, otherMap, connection, vectors)
     
   def detectLoops(self):
     """Detect loops within this map (tiles positioned in such a way that the player can run in circles)"""
@@ -325,7 +411,7 @@ class MapTile:
         doorNodes = self.map.root.FindRecurse(lambda node : node.name == "solid" and node.properties["id"] == portalSolidId[0])
         for doorNode in doorNodes:
           portalBounds = getBounds(findPortalOnSolid(doorNode))
-          removed += self.map.root.DeleteRecurse(lambda node : "classname" in node.properties and node.properties["classname"] == "prop_door_rotating" and pointNearPlane(node.origin,portalBounds))
+          removed += self.map.root.DeleteRecurse(lambda node : "classname" in node.properties and node.properties["classname"] == "prop_door_rotating" and pointNearPlane(node.origin,portalBounds), self.counts)
     print("Removed", removed, "doors to close map")
       
   def generateNavMeshScript(self):
@@ -363,7 +449,4 @@ class MapTile:
     for num, line in enumerate(lines):
       out += "alias \"navgen%03i\" \"%s;bind KP_PLUS navgen%03i\"\n"%(num,";".join(line),num+1)
     out += "alias \"navgen%03i\" \"echo Finished\"\n"%len(lines)
-    return out
-  
-  def __lt__(self, other):
-    return self
\ No newline at end of file
+    return out
\ No newline at end of file
@@ -0,0 +1,80 @@
+from VMFNode import VMFNode
+import contextlib
+import gc
+import json
+import tracemalloc
+
+TOP_SITES = 10 # The number of source lines with the largest allocations reported per phase
+IGNORED_FILES = [tracemalloc.__file__, __file__] # The allocations of tracemalloc and the profiler itself are not reported as sites
+
+def countNodes():
+  """Counts the live VMFNode objects by node name ("root" for the nodes holding a whole map)"""
+  counts = dict()
+  for obj in gc.get_objects():
+    if isinstance(obj, VMFNode):
+      name = obj.name
+      if name == None:
+        name = "root"
+      counts[name] = counts.get(name, 0) + 1
+  return counts
+
+class MemoryProfiler:
+  """The MemoryProfiler records the memory allocated in each phase of the generation and for each placed tile using tracemalloc
+     For every phase, the peak (the most memory allocated at once during the phase) and the retained memory (still allocated after it)
+     are recorded in bytes, along with the source lines which retained the most memory and the live VMFNode objects by node name.
+     Memory allocated in worker processes is not recorded. If the profiler is not enabled, it does nothing."""
+
+  def __init__(self, enabled):
+    """Constructor, starts tracing memory allocations if enabled"""
+    self.enabled = enabled
+    self.phases = []
+    self.tiles = []
+    self.peak = 0
+    self.tilePeak = 0
+    if enabled:
+      tracemalloc.start()
+
+  @contextlib.contextmanager
+  def phase(self, name):
+    """Records the memory allocated within the with block as a phase"""
+    if not self.enabled:
+      yield
+      return
+    snapshot = tracemalloc.take_snapshot()
+    before = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    self.tilePeak = 0
+    yield
+    current, peak = tracemalloc.get_traced_memory()
+    peak = max(peak, self.tilePeak) # tile() resets the peak
+    self.peak = max(self.peak, peak)
+    sites = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+    sites = [site for site in sites if not site.traceback[0].filename in IGNORED_FILES][:TOP_SITES]
+    self.phases.append(dict({
+      'name': name,
+      'peak': peak - before,
+      'retained': current - before,
+      'sites': [dict({'site': str(site.traceback), 'retained': site.size_diff, 'allocations': site.count_diff}) for site in sites],
+      'nodes': countNodes()}))
+
+  @contextlib.contextmanager
+  def tile(self, filename):
+    """Records the memory allocated within the with block for placing a tile"""
+    if not self.enabled:
+      yield
+      return
+    before, peak = tracemalloc.get_traced_memory()
+    self.tilePeak = max(self.tilePeak, peak)
+    tracemalloc.reset_peak()
+    yield
+    current, peak = tracemalloc.get_traced_memory()
+    self.tilePeak = max(self.tilePeak, peak)
+    self.tiles.append(dict({'tile': filename, 'peak': peak - before, 'retained': current - before}))
+
+  def tofile(self, filename):
+    """Writes the report as a JSON file, including the most memory allocated at once during all phases"""
+    if not self.enabled:
+      return
+    file = open(filename, "w")
+    json.dump(dict({'peak': self.peak, 'phases': self.phases, 'tiles': self.tiles}), file, indent=2)
+    file.close()
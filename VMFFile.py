@@ -1,5 +1,47 @@
 from VMFNode import VMFNode
 import copy
+import multiprocessing
+import tracemalloc
+
+CHUNKS_PER_WORKER = 8 # The nodes of a map are split into this many chunks per worker process when writing in parallel
+
+exportRoot = None
+
+def initExportWorker(root):
+  """Keeps the root node of the map to be written in the worker process. Memory profiling is not continued in the worker."""
+  global exportRoot
+  tracemalloc.stop()
+  exportRoot = root
+
+def formatChunk(chunk):
+  """Prints out a range of child nodes in VMF compatible format, runs in a worker process"""
+  parentIndex, start, end, depth = chunk
+  if parentIndex == None:
+    parent = exportRoot
+  else:
+    parent = exportRoot.children[parentIndex]
+  return "".join([node.ToStringRecurse(depth) for node in parent.children[start:end]])
+
+def getChunks(root, chunkSize):
+  """Splits the map into the header and footer of the world node (strings) and ranges of nodes to be printed.
+     A range is given by the index of its parent in the root's children (None for the root), its start, end and depth.
+     Printing all of them in order yields the same as root.ToStringRecurse(0)."""
+  chunks = []
+  start = 0
+  for index, child in enumerate(root.children):
+    if child.name == "world" or index - start == chunkSize:
+      if index > start:
+        chunks.append((None, start, index, 0))
+      start = index
+    if child.name == "world":
+      chunks.append(child.HeaderToString(0))
+      for worldStart in range(0, len(child.children), chunkSize):
+        chunks.append((index, worldStart, min(worldStart + chunkSize, len(child.children)), 1))
+      chunks.append(child.FooterToString(0))
+      start = index + 1
+  if len(root.children) > start:
+    chunks.append((None, start, len(root.children), 0))
+  return chunks
 
 class VMFFile:
   """The VMFFile class reads a VMF File
@@ -39,6 +81,29 @@ class VMFFile:
     self.root = node
     return self
     
+  def tofile(self, filename, workers=None):
+    """Writes a VMF file. If workers is set, the world's child nodes and the entities are printed in chunks by that many processes.
+       The output is the same either way."""
+    file = open(filename, "w")
+    if not workers:
+      file.write(self.root.ToStringRecurse(0))
+    else:
+      nodes = len(self.root.children)
+      if not self.root.getWorldIndex() == None:
+        nodes += len(self.root.children[self.root.getWorldIndex()].children)
+      chunkSize = max(1, nodes // (workers * CHUNKS_PER_WORKER))
+      chunks = getChunks(self.root, chunkSize)
+      pool = multiprocessing.Pool(workers, initExportWorker, (self.root,))
+      results = pool.imap(formatChunk, [chunk for chunk in chunks if not isinstance(chunk, str)])
+      for chunk in chunks:
+        if isinstance(chunk, str):
+          file.write(chunk)
+        else:
+          file.write(next(results))
+      pool.close()
+      pool.join()
+    file.close()
+    
   def deepcopy(self):
     """Returns a deep copy of this object"""
     deepcopy = VMFFile()
@@ -21,6 +21,16 @@ def getBounds(points):
   """Returns the bounding box around the given set of 3D points"""
   return np.array([np.min(points, axis=0),np.max(points, axis=0)])
   
+def emptyCounts():
+  """Returns the counts of an empty map, see VMFNode.CountRecurse()"""
+  return dict({'solids': 0, 'sides': 0, 'entities': 0, 'doors': 0})
+
+def addCounts(counts, otherCounts, factor=1):
+  """Adds the other counts multiplied by factor to the given counts"""
+  for key in list(counts.keys()):
+    counts[key] += factor * otherCounts[key]
+  return counts
+  
 def planeNormal(plane):
   """Returns the normal vector for the given plane specified by three 3D points"""
   normal = np.cross(plane[0]-plane[1],plane[2]-plane[0])
@@ -157,23 +167,32 @@ class VMFNode:
       child = child.TranslateRecurse(vector)
     return self
       
+  def HeaderToString(self,depth):
+    """Print out this node's name and properties in VMF compatible format, up to where the child nodes start"""
+    output = indent(depth) + self.name + "\n" + indent(depth) +"{\n"
+    for key, value in list(self.properties.items()):
+      output += indent(depth+1) + "\""+key+"\" \""+value+"\"\n"
+    if not np.all(self.origin) == None:
+      output += indent(depth+1) + "\"origin\" \""+self.GetOrigin()+"\"\n"
+    if not np.all(self.plane) == None:
+      output += indent(depth+1) + "\"plane\" \""+self.GetPlane()+"\"\n"
+    return output
+
+  def FooterToString(self,depth):
+    """Print out the end of this node in VMF compatible format"""
+    return indent(depth) + "}\n"
+      
   def ToStringRecurse(self,depth):
     """Recursively print out this node and all child nodes in VMF compatible format"""
     if not self.name == None:
-      output = indent(depth) + self.name + "\n" + indent(depth) +"{\n"
-      for key, value in list(self.properties.items()):
-        output += indent(depth+1) + "\""+key+"\" \""+value+"\"\n"
-      if not np.all(self.origin) == None:
-        output += indent(depth+1) + "\"origin\" \""+self.GetOrigin()+"\"\n"
-      if not np.all(self.plane) == None:
-        output += indent(depth+1) + "\"plane\" \""+self.GetPlane()+"\"\n"
+      output = self.HeaderToString(depth)
     else:
       output = ""
       depth -= 1
     for child in self.children:
       output += child.ToStringRecurse(depth+1)
     if not self.name == None:
-      output += indent(depth) + "}\n"
+      output += self.FooterToString(depth)
     return output
     
   def IncreaseIdRecurse(self,increase):
@@ -231,16 +250,33 @@ class VMFNode:
         hits.extend(child.FindRecurse(predicate))
     return hits
   
-  def DeleteRecurse(self,predicate):
-    """Recursively delete all nodes matching the predicate"""
+  def DeleteRecurse(self,predicate,counts=None):
+    """Recursively delete all nodes matching the predicate.
+       If counts are given, the counts of the deleted nodes are subtracted from them."""
     removed = 0
     for child in self.children:
       if predicate(child):
         self.children.remove(child)
         removed += 1
+        if not counts == None:
+          addCounts(counts, child.CountRecurse(emptyCounts()), -1)
       else:
-        removed += child.DeleteRecurse(predicate)
+        removed += child.DeleteRecurse(predicate,counts)
     return removed
+
+  def CountRecurse(self,counts):
+    """Recursively count the solids, sides, entities and doors (prop_door_rotating) of this node and all child nodes into counts"""
+    if self.name == "solid":
+      counts["solids"] += 1
+    elif self.name == "side":
+      counts["sides"] += 1
+    elif self.name == "entity":
+      counts["entities"] += 1
+      if "classname" in self.properties and self.properties["classname"] == "prop_door_rotating":
+        counts["doors"] += 1
+    for child in self.children:
+      child.CountRecurse(counts)
+    return counts
     
   def GetBoundsRecurse(self):
     """Get this map's bounding box by recursively searching for the outmost bounds"""
@@ -0,0 +1,81 @@
+import random
+
+class WeightedSampler:
+  """The WeightedSampler draws items with a probability proportional to their integer weight
+     The weights are stored in a Fenwick tree (binary indexed tree), so drawing and disabling an item take O(log n).
+     The indices of all items drawn so far are kept in drawn.
+     https://en.wikipedia.org/wiki/Fenwick_tree"""
+
+  def __init__(self, items=(), weights=()):
+    """Builds the tree for the given items and weights in O(n)"""
+    if not len(items) == len(weights):
+      raise AssertionError("Got "+str(len(items))+" items but "+str(len(weights))+" weights")
+    self.items = list(items)
+    self.weights = []
+    for weight in weights:
+      weight = int(weight)
+      if weight < 0:
+        raise AssertionError("Invalid negative weight "+str(weight))
+      self.weights.append(weight)
+    self.tree = [0] + self.weights
+    for index in range(1, len(self.tree)):
+      parent = index + (index & -index)
+      if parent < len(self.tree):
+        self.tree[parent] += self.tree[index]
+    self.total = sum(self.weights)
+    self.drawn = set()
+
+  def copy(self):
+    """Returns a copy of this sampler sharing the items, but not the weights"""
+    copy = WeightedSampler()
+    copy.items = self.items
+    copy.weights = list(self.weights)
+    copy.tree = list(self.tree)
+    copy.total = self.total
+    copy.drawn = set(self.drawn)
+    return copy
+
+  def __len__(self):
+    return len(self.items)
+
+  def __getitem__(self, index):
+    return self.items[index]
+
+  def getWeight(self, index):
+    return self.weights[index]
+
+  def setWeight(self, index, weight):
+    """Changes the weight of the item at the given index"""
+    weight = int(weight)
+    if weight < 0:
+      raise AssertionError("Invalid negative weight "+str(weight))
+    delta = weight - self.weights[index]
+    self.weights[index] = weight
+    self.total += delta
+    position = index + 1
+    while position < len(self.tree):
+      self.tree[position] += delta
+      position += position & -position
+
+  def disable(self, index):
+    """Prevents the item at the given index from being drawn again"""
+    self.setWeight(index, 0)
+
+  def choice(self):
+    """Returns the index of a randomly drawn item, or None if all weights are zero.
+       Uses the random module, so the result is deterministic for a given random.seed()."""
+    if self.total <= 0:
+      return None
+    remaining = random.randrange(self.total)
+    position = 0
+    step = 1
+    while step * 2 < len(self.tree):
+      step *= 2
+    while step > 0:
+      nextPosition = position + step
+      if nextPosition < len(self.tree) and self.tree[nextPosition] <= remaining:
+        position = nextPosition
+        remaining -= self.tree[nextPosition]
+      step //= 2
+    self.drawn.add(position)
+    return position
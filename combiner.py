@@ -1,8 +1,19 @@
+from Collision import CollisionWorld
+from GenerationController import GenerationController
+from MemoryProfiler import MemoryProfiler
 import MapTile
 from VMFNode import vectorToString
+from WeightedSampler import WeightedSampler
+import argparse
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import numpy as np
 import os
 import random
 import sys
+import tracemalloc
 
 """
 This proof-of-concept random map generator for Left 4 Dead 2 (and other Hammer based maps) loads map tiles from VMF files and puts them together randomly.
@@ -10,6 +21,10 @@ This proof-of-concept random map generator for Left 4 Dead 2 (and other Hammer b
 SEED = 42 # This random seed affects the selection of tiles and connections. A change leads to a completely different map layout.
 NUMBER_OF_TILES = 150 # How many tiles there should be in the map.
 TAIL_LENGTH = 8 # The number of portals considered to be the tail of the map. Greater values produce more dead ends.
+WEIGHTS_FILENAME = "weights.txt" # Optional file in a tile directory listing "<tile filename> <weight>" per line.
+REGION_SIZE = 8192 # Edge length of the square region each worker grows its part of the map in (see --workers).
+REGION_HEIGHT = 4096 # Height of the region each worker grows its part of the map in.
+MAP_LIMITS = dict({'solids': 8192, 'sides': 65536, 'entities': 8192, 'doors': 512}) # Tiles which would exceed these counts are not added. Brushes, brush sides and entities are limited by vbsp; every door is an edict, of which the game only has 2048 for everything.
 
 def chooseConnection(connections):
   """Choses a random connection out of the given ones"""
@@ -23,17 +38,26 @@ def chooseConnection(connections):
     return connection
   else:
     return None  
-def collide(box, blockingBoxes):
-  """Checks whether two bounding boxes collide"""
-  for blockingBox in blockingBoxes:
-    if MapTile.collide(blockingBox,box):
-      return True
-  return False
-    
-def addTile(base, tile, blockingBoxes):
-  """Adds a tile by trying all possible connections"""
+def createWorld(base, region=None):
+  """Returns a new collision world holding the base tile"""
+  world = CollisionWorld(region)
+  world.add(base.bounds, base.bvh, np.zeros(3, dtype=int))
+  return world
+
+def placeTile(base, tile, connection, vectors, world):
+  """Adds a tile to the map and the collision world using the given connection and vectors"""
+  vector = vectors[0]
+  world.add(MapTile.translateBounds(tile.bounds, vector), tile.bvh, vector)
+  base.append(tile, connection, vectors)
 
-  directions = base.findConnections(tile, TAIL_LENGTH)
+def findPlacement(base, tile, world, tailLength=TAIL_LENGTH):
+  """Finds the first connection for a tile which does not collide, returns the connection and the vectors or None.
+     Only the portals in the tail of the map are tried, all open portals if tailLength is None."""
+  if base.exceedsLimits(tile, MAP_LIMITS):
+    print ("Tile exceeds map limits")
+    return None
+
+  directions = base.findConnections(tile, tailLength)
   for direction in directions:
     connection = (direction[0], direction[1], direction[2])
 
@@ -41,16 +65,25 @@ def addTile(base, tile, blockingBoxes):
     vector = vectors[0]
     translatedBounds = MapTile.translateBounds(tile.bounds, vector)
     
-    if not collide(translatedBounds, blockingBoxes):
-      blockingBoxes.append(translatedBounds)
-      base.append(tile, connection, vectors)
-      return True
+    if not world.collides(translatedBounds, tile.bvh, vector):
+      return (connection, vectors)
     else:
       print ("Tiles collide")
-  return False
+  return None
+
+def addTile(base, tile, world, tailLength=TAIL_LENGTH):
+  """Adds a tile by trying all possible connections"""
+  placement = findPlacement(base, tile, world, tailLength)
+  if placement == None:
+    return False
+  placeTile(base, tile, placement[0], placement[1], world)
+  return True
     
-def tryAddTile(base, tile, blockingBoxes):
+def tryAddTile(base, tile, world):
   """Tries to add a tile by trying one random connection"""
+  if base.exceedsLimits(tile, MAP_LIMITS):
+    print ("Tile exceeds map limits")
+    return False
 
   connections = base.findConnections(tile, TAIL_LENGTH)
   connection = chooseConnection(connections)
@@ -59,31 +92,64 @@ def tryAddTile(base, tile, blockingBoxes):
   vectors = base.findPortalsAndVector(tile, connection)
   vector = vectors[0]
   translatedBounds = MapTile.translateBounds(tile.bounds, vector)
-  if collide(translatedBounds, blockingBoxes):
+  if world.collides(translatedBounds, tile.bvh, vector):
     print ("Tiles collide")
     return False
   else:
-    blockingBoxes.append(translatedBounds)
-    base.append(tile, connection, vectors)
+    placeTile(base, tile, connection, vectors, world)
     return True
     
-def selectAndTryToAddTile(base, tiles, blockingBoxes):
-  """Selects a random tile and tries to add it to the map"""
-  tile = random.choice(tiles)
+def selectAndTryToAddTile(base, tiles, world):
+  """Selects a random tile by weight and tries to add it to the map"""
+  index = tiles.choice()
+  if index == None:
+    return False
+  tile = tiles[index]
   print("Chose tile:", os.path.basename(tile.filename))
-  success = tryAddTile(base, tile, blockingBoxes)
+  success = tryAddTile(base, tile, world)
   if success and tile.getOnce():
-    tiles.remove(tile)
+    tiles.disable(index)
     print ("Removed tile from pool because it specified to be addeed only once.")
   return success
-    
+
+def loadWeights(path):
+  """Loads the tile weights from the weights file of a directory, if there is one"""
+  weights = dict()
+  if not os.path.isfile(path+WEIGHTS_FILENAME):
+    return weights
+  file = open(path+WEIGHTS_FILENAME, "r")
+  for line in file:
+    line = line.split("#")[0].strip()
+    if line:
+      split = line.split()
+      try:
+        if not len(split) == 2 or int(split[1]) < 0:
+          raise ValueError
+        weights[split[0]] = int(split[1])
+      except ValueError:
+        print("WARNING: Ignoring malformed line in", WEIGHTS_FILENAME, ":", line)
+  file.close()
+  return weights
+
+def getTileWeight(basename, weights):
+  """Returns the weight of a tile, from the weights file or else from a numeric filename prefix like "2_".
+     A prefix adds the tile that many more times to the pool, so "2_" gives a weight of 3."""
+  if basename in weights:
+    return weights[basename]
+  try:
+    return 1 + int(basename.split('_')[0])
+  except ValueError:
+    return 1
+
 def loadTiles(path):
   """Loads all tiles from a directory"""
   print("== LOADING MAP FILES ==")
   starts = []
   tiles = []
+  tileWeights = []
   finales = []
-  listing = os.listdir(path)
+  weights = loadWeights(path)
+  listing = sorted(os.listdir(path))
   for filename in listing:
     if filename[-3:] == "vmf":
       basename = os.path.basename(filename)
@@ -97,79 +163,362 @@ def loadTiles(path):
       else:
         if filename[:4] == "once":
           maptile.setOnce(True)
+        weight = getTileWeight(basename, weights)
+        if not weight == 1:
+          print("NOTE: Tile is", weight, "times more likely to be chosen.")
         tiles.append(maptile)
-        try: 
-          repeat = int(basename.split('_')[0])
-          print("NOTE: Tile is", repeat, "times more likely to be chosen.")
-          for i in range(repeat):
-            tiles.append(maptile)
-        except ValueError:
-          pass
-  return (starts, tiles, finales)
+        tileWeights.append(weight)
+  pool = set(os.path.basename(tile.filename) for tile in tiles)
+  for basename in weights:
+    if not basename in pool:
+      print("WARNING:", WEIGHTS_FILENAME, "lists", basename, "which is not in the tile pool")
+  return (starts, WeightedSampler(tiles, tileWeights), finales)
+    
+def growMap(base, tiles, world, controller, finale=None):
+  """Adds random tiles to the map until the controller stops.
+     If a finale tile is given, returns the number of placements after which it could have been appended last, or None."""
+  checkpoint = None
+  if not finale == None and not findPlacement(base, finale, world) == None:
+    checkpoint = len(base.placements)
+  print("-- TILE 1 --")
+  while not controller.shouldStop():
+    success = selectAndTryToAddTile(base, tiles, world)
+    controller.record(success)
+    if success:
+      print("-- TILE", controller.tilesAdded + 1, "--")
+      if not finale == None and not findPlacement(base, finale, world) == None:
+        checkpoint = len(base.placements)
+  return checkpoint
+
+def addFinale(base, finale, world, tailLength=TAIL_LENGTH):
+  """Appends the finale tile, returns whether it was added"""
+  if not addTile(base, finale, world, tailLength):
+    print ("ERROR: Failed to append final \"finale\" tile.")
+    return False
+  return True
+
+def createController(tiles, deadline=None, stallLimit=None, numberOfTiles=NUMBER_OF_TILES):
+  """Returns a controller for adding numberOfTiles tiles from the given pool.
+     The attempts are limited to numberOfTiles times the summed weights, i.e. the size of the pool if every tile was in it as often as its weight."""
+  return GenerationController(numberOfTiles, numberOfTiles * tiles.total, deadline, stallLimit)
+
+def generate(start, tiles, finale, controller=None):
+  """Plans the map on the tiles' layouts: grows it from the start tile until the controller stops, then appends the finale tile.
+     If the finale tile cannot be appended, the map is rolled back to the last placement after which it could be.
+     Returns the layout, the number of added tiles, whether the finale was added, the collision world and the controller."""
+  if controller == None:
+    controller = createController(tiles)
+  base = start.layout()
+  world = createWorld(base)
+  checkpoint = growMap(base, tiles, world, controller, finale)
+  print("Stopped adding tiles:", controller.explain())
+  tilesAdded = controller.tilesAdded
+
+  if addTile(base, finale, world):
+    return (base, tilesAdded, True, world, controller)
+  if checkpoint == None:
+    print ("ERROR: Failed to append final \"finale\" tile.")
+    return (base, tilesAdded, False, world, controller)
+
+  print("Rolling back to", checkpoint, "tiles to append the finale tile")
+  controller.rollBack(checkpoint)
+  placements = base.placements[:checkpoint]
+  base = start.layout()
+  world = createWorld(base)
+  for tile, connection, vectors in placements:
+    placeTile(base, tile, connection, vectors, world)
+  return (base, checkpoint, addFinale(base, finale, world), world, controller)
+
+def buildMap(start, layout, profiler=None):
+  """Builds the map by appending the tiles to the start tile like they were placed on the layout"""
+  if profiler == None:
+    profiler = MemoryProfiler(False)
+  base = start
+  for tile, connection, vectors in layout.placements:
+    with profiler.tile(os.path.basename(tile.filename)):
+      base.append(tile, connection, vectors)
+  return base
+
+def getParameters():
+  """Returns the parameters which affect the generated maps"""
+  return dict({'NUMBER_OF_TILES': NUMBER_OF_TILES, 'TAIL_LENGTH': TAIL_LENGTH, 'REGION_SIZE': REGION_SIZE, 'REGION_HEIGHT': REGION_HEIGHT, 'MAP_LIMITS': MAP_LIMITS})
+
+def listTileFiles(path):
+  """Returns the names of all tile files in a directory"""
+  return sorted([filename for filename in os.listdir(path) if filename[-3:] == "vmf"])
+
+def hashFile(filename):
+  """Returns the SHA-256 hash of a file's content"""
+  file = open(filename, "rb")
+  digest = hashlib.sha256(file.read()).hexdigest()
+  file.close()
+  return digest
+
+def getManifest(style, usedFiles):
+  """Returns the manifest of a map: the command line and parameters it was generated with,
+     the tile files available and the content hashes of the files it depends on.
+     Only the tiles that were drawn (whether they were added or not), the start and finale tile and the weights file affect the map."""
+  path = "tiles/" + style + "/"
+  files = set(os.path.basename(filename) for filename in usedFiles)
+  if os.path.isfile(path + WEIGHTS_FILENAME):
+    files.add(WEIGHTS_FILENAME)
+  return dict({
+    'command': sys.argv[1:],
+    'style': style,
+    'parameters': getParameters(),
+    'pool': listTileFiles(path),
+    'files': dict((filename, hashFile(path + filename)) for filename in sorted(files))})
+
+regionStarts = None
+regionTiles = None
+
+def initRegionWorker(path):
+  """Loads the tiles once per worker process. Memory profiling is not continued in the worker."""
+  global regionStarts, regionTiles
+  tracemalloc.stop()
+  with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+    regionStarts, regionTiles, finales = loadTiles(path)
+
+def growRegion(task):
+  """Grows a part of the map within a region around a random tile, runs in a worker process.
+     The first region starts with a starting tile. Tiles to be added once are only used in the first region.
+     The controller is created here, so the deadline does not count the time spent starting the worker and loading the tiles.
+     Returns the map, its collision world, the controller and the filenames of all tiles drawn,
+     or None for all but the filenames if no tile is left to grow the region around."""
+  index, seed, numberOfTiles, deadline, stallLimit = task
+  with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+    controller = createController(regionTiles, deadline, stallLimit, numberOfTiles)
+    random.seed(seed)
+    tiles = regionTiles.copy()
+    if index == 0:
+      base = random.choice(regionStarts).deepcopy()
+    else:
+      for tileIndex in range(len(tiles)):
+        if tiles[tileIndex].getOnce():
+          tiles.disable(tileIndex)
+      tileIndex = tiles.choice()
+      if tileIndex == None:
+        return (None, None, None, [])
+      base = tiles[tileIndex].deepcopy()
+    center = (base.bounds[0] + base.bounds[1]) // 2
+    halfSize = np.array([REGION_SIZE // 2, REGION_SIZE // 2, REGION_HEIGHT // 2])
+    world = createWorld(base, np.array([center - halfSize, center + halfSize]))
+    growMap(base, tiles, world, controller)
+  return (base, world, controller, [tiles[tileIndex].filename for tileIndex in sorted(tiles.drawn)])
+
+def addRegionWorld(world, subWorld, vector):
+  """Adds all tiles of the collision world of a region, translated by the given vector, to the world"""
+  for index in range(len(subWorld)):
+    world.add(MapTile.translateBounds(subWorld.bounds[index], vector), subWorld.bvhs[index], subWorld.vectors[index] + vector)
+
+def stitchRegion(base, world, subMap, subWorld):
+  """Mends a map grown in another region to the base map through any pair of matching open portals
+     where the translated region does not collide with the base map. Returns the connection and the vectors or None."""
+  if base.exceedsLimits(subMap, MAP_LIMITS):
+    return None
+  connections = base.findConnections(subMap)
+  random.shuffle(connections)
+  for connection in connections:
+    vectors = base.findPortalsAndVector(subMap, connection)
+    vector = vectors[0]
+    if vector is None:
+      continue
+    translatedBounds = [MapTile.translateBounds(bounds, vector) for bounds in subWorld.bounds]
+    if not any(world.collides(translatedBounds[index], subWorld.bvhs[index], subWorld.vectors[index] + vector) for index in range(len(subWorld))):
+      addRegionWorld(world, subWorld, vector)
+      base.mend(subMap, connection, vectors)
+      return (connection, vectors)
+  return None
+
+def findFinalePlacement(base, finale, world):
+  """Finds a placement for the finale tile at the tail of the map, or else at any open portal.
+     After stitching, the tail is in the last stitched region, so the finale tile may only fit at an open portal of another region."""
+  placement = findPlacement(base, finale, world)
+  if placement == None:
+    placement = findPlacement(base, finale, world, None)
+  return placement
+
+def replayStitches(regions, stitches):
+  """Returns the layout and the collision world of the first region with the regions of the given stitches mended to it"""
+  base = regions[0][0].layout()
+  world = CollisionWorld() # without the region of the first world, the stitched map may grow beyond it
+  addRegionWorld(world, regions[0][1], np.zeros(3, dtype=int))
+  for index, connection, vectors in stitches:
+    addRegionWorld(world, regions[index][1], vectors[0])
+    base.mend(regions[index][0].layout(), connection, vectors)
+  return (base, world)
+
+def explainRegions(controllers, rolledBack=None):
+  """Returns a human readable explanation of why each region stopped adding tiles and of the rollback, if any"""
+  explanations = []
+  for index, controller in enumerate(controllers):
+    if controller == None:
+      explanations.append("Region " + str(index + 1) + ": No tile was left to grow it around.")
+    else:
+      explanations.append("Region " + str(index + 1) + ": " + controller.explain())
+  explanation = " ".join(explanations)
+  if not rolledBack == None:
+    explanation += " Rolled back to " + str(rolledBack) + " stitched regions to append the finale tile."
+  return explanation
+
+def generateRegions(path, tiles, finale, workers, deadline=None, stallLimit=None):
+  """Grows one part of the map per worker process in its own region, then stitches the parts together and appends the finale tile.
+     The stitches are planned on the layouts. If the finale tile cannot be appended, the map is rolled back to the last stitched region
+     after which it could have been. Then the planned stitches are applied to the map.
+     The IDs of every stitched part are shifted by mend, so they stay unique. The map only depends on the seed and the number of workers.
+     Returns the map, the number of added tiles, whether the finale was added, the collision world, the filenames of all tiles drawn
+     and why adding tiles stopped."""
+  seeds = [random.randrange(2**32) for index in range(workers)]
+  tasks = []
+  for index in range(workers):
+    numberOfTiles = NUMBER_OF_TILES // workers
+    if index == 0:
+      numberOfTiles += NUMBER_OF_TILES % workers
+    else:
+      numberOfTiles -= 1 # the tile the region is grown around
+    tasks.append((index, seeds[index], numberOfTiles, deadline, stallLimit))
+
+  pool = multiprocessing.Pool(workers, initRegionWorker, (path,))
+  results = pool.map(growRegion, tasks)
+  pool.close()
+  pool.join()
+
+  regions = [(subMap, subWorld) for subMap, subWorld, controller, drawn in results]
+  controllers = [controller for subMap, subWorld, controller, drawn in results]
+  usedFiles = set([regions[0][0].filename])
+  for subMap, subWorld, controller, drawn in results:
+    usedFiles.update(drawn)
+
+  base, world = replayStitches(regions, [])
+  print("Region", 1, ":", len(world) - 1, "tiles")
+  stitches = []
+  checkpoint = None
+  if not findFinalePlacement(base, finale, world) == None:
+    checkpoint = 0
+  for index in range(1, len(regions)):
+    subMap, subWorld = regions[index]
+    if subMap == None:
+      print("WARNING: No tile was left to grow region", index + 1, "around")
+      continue
+    stitch = stitchRegion(base, world, subMap.layout(), subWorld)
+    if stitch == None:
+      print("WARNING: Failed to stitch region", index + 1, "with", len(subWorld), "tiles")
+    else:
+      stitches.append((index, stitch[0], stitch[1]))
+      print("Region", index + 1, ":", len(subWorld), "tiles")
+      if not findFinalePlacement(base, finale, world) == None:
+        checkpoint = len(stitches)
+
+  rolledBack = None
+  placement = findFinalePlacement(base, finale, world)
+  if placement == None and not checkpoint == None:
+    print("Rolling back to", checkpoint, "stitched regions to append the finale tile")
+    rolledBack = checkpoint
+    stitches = stitches[:checkpoint]
+    base, world = replayStitches(regions, stitches)
+    placement = findFinalePlacement(base, finale, world)
+  tilesAdded = len(world) - 1
+  status = explainRegions(controllers, rolledBack)
+  print("Stopped adding tiles:", status)
+
+  print("Stitching regions...")
+  base = regions[0][0]
+  for index, connection, vectors in stitches:
+    base.mend(regions[index][0], connection, vectors)
+  if placement == None:
+    print ("ERROR: Failed to append final \"finale\" tile.")
+    return (base, tilesAdded, False, world, usedFiles, status)
+  placeTile(base, finale, placement[0], placement[1], world)
+  return (base, tilesAdded, True, world, usedFiles, status)
     
 if __name__ == "__main__":
   """Main program"""
+  parser = argparse.ArgumentParser(description="Generates a random map from map tiles.")
+  parser.add_argument("seed", type=int, nargs="?", default=SEED, help="random seed (default: " + str(SEED) + ")")
+  parser.add_argument("mapname", nargs="?", default=None, help="name of the generated map (default: map-[seed])")
+  parser.add_argument("--style", default="dev", help="map style, i.e. the directory in tiles/ (default: dev)")
+  parser.add_argument("--workers", type=int, default=None, help="grow the map in this many regions in parallel and stitch them together")
+  parser.add_argument("--export-workers", type=int, default=None, help="write the map file with this many processes")
+  parser.add_argument("--deadline", type=float, default=None, help="stop adding tiles after this many seconds and append the finale")
+  parser.add_argument("--profile-memory", action="store_true", help="record the memory allocated in each phase and write it to [mapname].memory.json")
+  parser.add_argument("--stall", type=int, default=None, help="stop adding tiles after this many failed attempts in a row and append the finale")
+  parser.add_argument("--output", default="./output/", help="directory to write the map to (default: ./output/)")
+  parser.add_argument("--nav-script", default="../../left4dead2/cfg/combined.cfg", help="config file to write the nav mesh script to (default: ../../left4dead2/cfg/combined.cfg)")
+  args = parser.parse_args()
 
-  if len(sys.argv) >= 2:
-    SEED = int(sys.argv[1])
+  SEED = args.seed
   random.seed(SEED)
 
-  if len(sys.argv) >= 3:
-    filename = "./output/" + sys.argv[2] + ".vmf"
+  if args.mapname:
+    filename = os.path.join(args.output, args.mapname + ".vmf")
   else:
-    filename = "./output/map-" + str(SEED) + ".vmf"
+    filename = os.path.join(args.output, "map-" + str(SEED) + ".vmf")
 
-  mapStyle = "dev"
+  mapStyle = args.style
 
   print("+++++ L4D2 LEVEL GENERATOR +++++")
   print("Seed:", SEED)
   print("Tile count:", NUMBER_OF_TILES)
   print("Max tail length:", TAIL_LENGTH)
   print("Map Style:", mapStyle)
+  if args.workers:
+    print("Workers:", args.workers)
   print("Outputting to", filename)
 
   print()
 
+  profiler = MemoryProfiler(args.profile_memory)
+
   tilePath = "tiles/" + mapStyle + "/"
-  starts, tiles, finales = loadTiles(tilePath)
+  with profiler.phase("load"):
+    starts, tiles, finales = loadTiles(tilePath)
 
   print()
 
   print("== BEGIN MAP FILE CREATION ==")
 
-  base = random.choice(starts)
-  print("Chose starting tile", base.filename)
+  if args.workers:
+    finale = random.choice(finales)
+    print("Chose ending tile", finale.filename)
 
-  finale = random.choice(finales)
-  print("Chose ending tile", finale.filename)
+    with profiler.phase("regions"):
+      base, tilesAdded, addedFinale, world, usedFiles, status = generateRegions(tilePath, tiles, finale, args.workers, args.deadline, args.stall)
+    usedFiles.add(finale.filename)
+  else:
+    start = random.choice(starts)
+    print("Chose starting tile", start.filename)
 
-  tiles.sort()
-  blockingBoxes = [base.bounds]
+    finale = random.choice(finales)
+    print("Chose ending tile", finale.filename)
 
-  tilesAdded = 0
-  print("-- TILE 1 --")
-  for i in range(NUMBER_OF_TILES * len(tiles)):
-    if selectAndTryToAddTile(base, tiles, blockingBoxes):
-      tilesAdded += 1
-      print("-- TILE", tilesAdded + 1, "--")
-    if tilesAdded == NUMBER_OF_TILES:
-      break
-  
-  addedFinale = True
-
-  if not addTile(base, finale, blockingBoxes):
-    print ("ERROR: Failed to append final \"finale\" tile.")
-    addedFinale = False
-  else:
-    pass
+    controller = createController(tiles, args.deadline, args.stall)
+    with profiler.phase("plan"):
+      layout, tilesAdded, addedFinale, world, controller = generate(start, tiles, finale, controller)
+    status = controller.explain()
+    usedFiles = set(tiles[tileIndex].filename for tileIndex in tiles.drawn)
+    usedFiles.update([start.filename, finale.filename])
+
+    print("Building map...")
+    with profiler.phase("build"):
+      base = buildMap(start, layout, profiler)
     
-  base.close()
+  with profiler.phase("close"):
+    base.close()
+
+  with profiler.phase("export"):
+    base.map.tofile(filename, args.export_workers)
+
+  file = open(filename[:-4] + ".stats.json", "w")
+  json.dump(dict({'seed': SEED, 'tiles': tilesAdded, 'finale': addedFinale, 'counts': base.counts, 'limits': MAP_LIMITS}), file, indent=2)
+  file.close()
+
+  profiler.tofile(filename[:-4] + ".memory.json")
 
-  file = open(filename, "w")
-  file.write(base.map.root.ToStringRecurse(0))
+  file = open(filename[:-4] + ".manifest.json", "w")
+  json.dump(getManifest(mapStyle, usedFiles), file, indent=2)
   file.close()
 
-  file = open("../../left4dead2/cfg/combined.cfg","w")
+  file = open(args.nav_script,"w")
   file.write(base.generateNavMeshScript())
   file.close()
 
@@ -178,4 +527,9 @@ if __name__ == "__main__":
   print("== RESULTS ==")
   print("Successfully created map", filename, "with seed", SEED)
   print("Total tiles:", tilesAdded)
-  print("Finale added:", addedFinale)
\ No newline at end of file
+  print("Finale added:", addedFinale)
+  print("Solids:", base.counts["solids"], "Sides:", base.counts["sides"], "Entities:", base.counts["entities"], "Doors:", base.counts["doors"])
+  if status:
+    print("Stopped adding tiles:", status)
+  if args.profile_memory:
+    print("Peak memory:", profiler.peak // 1024, "KiB")
\ No newline at end of file
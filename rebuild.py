@@ -0,0 +1,88 @@
+import combiner
+import argparse
+import json
+import multiprocessing.pool
+import os
+import subprocess
+import sys
+
+"""
+Regenerates only the maps whose tiles or parameters changed since they were generated.
+combiner.py writes a manifest next to every map with its command line, the parameters,
+the tile files available and the content hashes of the tile files the map depends on.
+"""
+
+def findOutdated(manifest):
+  """Returns the reason why the map of the given manifest has to be regenerated, or None if it is up to date"""
+  path = "tiles/" + manifest["style"] + "/"
+  if not os.path.isdir(path):
+    return "tile directory " + path + " is missing"
+  if not manifest["parameters"] == json.loads(json.dumps(combiner.getParameters())):
+    return "parameters changed"
+  if not manifest["pool"] == combiner.listTileFiles(path):
+    return "tiles were added or removed"
+  for filename, digest in list(manifest["files"].items()):
+    if not os.path.isfile(path + filename):
+      return filename + " was removed"
+    if not combiner.hashFile(path + filename) == digest:
+      return filename + " changed"
+  if os.path.isfile(path + combiner.WEIGHTS_FILENAME) and not combiner.WEIGHTS_FILENAME in manifest["files"]:
+    return combiner.WEIGHTS_FILENAME + " was added"
+  return None
+
+def getCommand(command, output, navScript):
+  """Returns the stored arguments of combiner.py with the output directory and the nav mesh script file replaced"""
+  arguments = []
+  skip = False
+  for argument in command:
+    if skip:
+      skip = False
+    elif argument in ["--output", "--nav-script"]:
+      skip = True
+    elif not argument.startswith("--output=") and not argument.startswith("--nav-script="):
+      arguments.append(argument)
+  return arguments + ["--output", output, "--nav-script", navScript]
+
+def regenerate(command):
+  """Runs combiner.py with the given arguments, returns the exit code"""
+  return subprocess.call([sys.executable, "combiner.py"] + command, stdout=subprocess.DEVNULL)
+
+if __name__ == "__main__":
+  """Main program"""
+  parser = argparse.ArgumentParser(description="Regenerates the maps whose tiles or parameters changed.")
+  parser.add_argument("--output", default="./output/", help="directory with the maps and their manifests (default: ./output/)")
+  parser.add_argument("--processes", type=int, default=None, help="number of maps to generate at once (default: all cores)")
+  parser.add_argument("--dry-run", action="store_true", help="only list the maps which would be regenerated")
+  args = parser.parse_args()
+
+  print("+++++ L4D2 LEVEL GENERATOR REBUILD +++++")
+
+  commands = []
+  manifests = sorted([filename for filename in os.listdir(args.output) if filename.endswith(".manifest.json")])
+  for filename in manifests:
+    file = open(os.path.join(args.output, filename), "r")
+    manifest = json.load(file)
+    file.close()
+    reason = findOutdated(manifest)
+    if reason:
+      mapname = filename[:-len(".manifest.json")]
+      print("Outdated:", mapname, "-", reason)
+      # The maps are generated at once, so each one gets its own nav mesh script instead of the shared combined.cfg
+      commands.append(getCommand(manifest["command"], args.output, os.path.join(args.output, mapname + ".cfg")))
+
+  print()
+
+  if args.dry_run:
+    print("== RESULTS ==")
+    print(len(commands), "of", len(manifests), "maps are outdated")
+  else:
+    pool = multiprocessing.pool.ThreadPool(args.processes or os.cpu_count())
+    results = pool.map(regenerate, commands)
+    pool.close()
+    pool.join()
+
+    print("== RESULTS ==")
+    print("Regenerated", results.count(0), "of", len(commands), "outdated maps,", len(manifests) - len(commands), "maps are up to date")
+    for command, result in zip(commands, results):
+      if not result == 0:
+        print("ERROR: Failed to regenerate", " ".join(command))
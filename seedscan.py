@@ -0,0 +1,138 @@
+import combiner
+from WeightedSampler import WeightedSampler
+import argparse
+import contextlib
+import csv
+import multiprocessing
+import os
+import random
+
+"""
+Scans a range of seeds and ranks them without writing any maps.
+Only the tile layouts (bounds and portals) are placed, the VMF trees are never copied or merged.
+The placement decisions are the same as in combiner.py, so a seed from the report generates the reported map.
+"""
+COLUMNS = ["seed", "tiles", "finale", "status", "attempts", "extent_x", "extent_y", "extent_z", "dead_ends", "path_length"]
+DEFAULT_SORT = "finale,tiles,path_length" # Columns to sort the report by, in descending order
+
+starts = None
+tiles = None
+finales = None
+devnull = None
+
+def loadLayouts(path):
+  """Loads all tiles from a directory and keeps their layouts only"""
+  loadedStarts, loadedTiles, loadedFinales = combiner.loadTiles(path)
+  layouts = [tile.layout() for tile in loadedTiles.items]
+  return ([start.layout() for start in loadedStarts], WeightedSampler(layouts, loadedTiles.weights), [finale.layout() for finale in loadedFinales])
+
+def initWorker(path):
+  """Loads the tile layouts once per worker process"""
+  global starts, tiles, finales, devnull
+  devnull = open(os.devnull, "w")
+  with contextlib.redirect_stdout(devnull):
+    starts, tiles, finales = loadLayouts(path)
+
+def getNeighbours(layout):
+  """Returns the adjacency lists of the tiles in the layout"""
+  neighbours = [[] for tile in range(layout.tileCount)]
+  for tile, otherTile in layout.links:
+    neighbours[tile].append(otherTile)
+    neighbours[otherTile].append(tile)
+  return neighbours
+
+def getPathLength(neighbours, start, end):
+  """Returns the number of tiles walked through from start to end (breadth first search), or -1 if there is no path"""
+  distances = {start: 0}
+  queue = [start]
+  for tile in queue:
+    if tile == end:
+      return distances[tile]
+    for neighbour in neighbours[tile]:
+      if not neighbour in distances:
+        distances[neighbour] = distances[tile] + 1
+        queue.append(neighbour)
+  return -1
+
+def scanSeed(seed):
+  """Places the tiles for one seed the same way combiner.py does and returns the metrics as a report row"""
+  with contextlib.redirect_stdout(devnull):
+    random.seed(seed)
+    start = random.choice(starts)
+    finale = random.choice(finales)
+    base, tilesAdded, addedFinale, world, controller = combiner.generate(start, tiles.copy(), finale)
+
+  bounds = world.getBounds()
+  extent = bounds[1] - bounds[0]
+  neighbours = getNeighbours(base)
+  finaleTile = base.tileCount - 1
+  deadEnds = 0
+  for tile in range(1, base.tileCount):
+    if len(neighbours[tile]) == 1 and not (addedFinale and tile == finaleTile):
+      deadEnds += 1
+  if addedFinale:
+    pathLength = getPathLength(neighbours, 0, finaleTile)
+  else:
+    pathLength = -1
+  return [seed, tilesAdded, int(addedFinale), controller.status, controller.attempts, int(extent[0]), int(extent[1]), int(extent[2]), deadEnds, pathLength]
+
+def scan(path, seeds, processes=None):
+  """Scans the given seeds on all cores, returns the report rows in seed order"""
+  if not processes:
+    processes = os.cpu_count()
+  pool = multiprocessing.Pool(processes, initWorker, (path,))
+  chunksize = max(1, len(seeds) // (processes * 16))
+  rows = list(pool.imap(scanSeed, seeds, chunksize))
+  pool.close()
+  pool.join()
+  return rows
+
+def sortRows(rows, columns):
+  """Sorts the report rows by the given column names, descending"""
+  indices = [COLUMNS.index(column) for column in columns]
+  return sorted(rows, key=lambda row : [row[index] for index in indices], reverse=True)
+
+if __name__ == "__main__":
+  """Main program"""
+  parser = argparse.ArgumentParser(description="Ranks a range of seeds without writing maps.")
+  parser.add_argument("first", type=int, help="first seed to scan")
+  parser.add_argument("last", type=int, help="last seed to scan (inclusive)")
+  parser.add_argument("--style", default="dev", help="map style, i.e. the directory in tiles/")
+  parser.add_argument("--processes", type=int, default=None, help="number of worker processes (default: all cores)")
+  parser.add_argument("--sort", default=DEFAULT_SORT, help="comma separated columns to sort by, descending (default: " + DEFAULT_SORT + ")")
+  parser.add_argument("--output", default=None, help="CSV report file (default: ./output/seedscan-[first]-[last].csv)")
+  args = parser.parse_args()
+
+  sortColumns = args.sort.split(",")
+  for column in sortColumns:
+    if not column in COLUMNS:
+      parser.error("unknown sort column \"" + column + "\", choose from " + ", ".join(COLUMNS))
+
+  if args.output:
+    filename = args.output
+  else:
+    filename = "./output/seedscan-" + str(args.first) + "-" + str(args.last) + ".csv"
+
+  print("+++++ L4D2 LEVEL GENERATOR SEED SCAN +++++")
+  print("Seeds:", args.first, "to", args.last)
+  print("Tile count:", combiner.NUMBER_OF_TILES)
+  print("Max tail length:", combiner.TAIL_LENGTH)
+  print("Map Style:", args.style)
+  print("Outputting to", filename)
+
+  rows = scan("tiles/" + args.style + "/", list(range(args.first, args.last + 1)), args.processes)
+  rows = sortRows(rows, sortColumns)
+
+  file = open(filename, "w", newline="")
+  writer = csv.writer(file)
+  writer.writerow(COLUMNS)
+  writer.writerows(rows)
+  file.close()
+
+  print()
+
+  print("== RESULTS ==")
+  print("Scanned", len(rows), "seeds")
+  print("Finale added:", sum(row[2] for row in rows), "seeds")
+  if len(rows) > 0:
+    print("Best seed:", rows[0][0])